@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.expanduser('~/.funding_cache')
+
+# Market lists change on the order of hours, so a few hours of staleness is safe
+DEFAULT_MARKETS_TTL = float(os.environ.get('FUNDING_CACHE_TTL', 6 * 60 * 60))
+
+# ccxt options that keep fetch_markets from downloading spot market lists, on exchanges that support it
+CONTRACT_MARKET_OPTIONS = {
+    'bitget': {'fetchMarkets': ['swap']},
+    'bybit': {'fetchMarkets': ['linear', 'inverse', 'option']},
+    'huobi': {'fetchMarkets': {'types': {'spot': False, 'linear': True, 'inverse': True}}},
+    'okx': {'fetchMarkets': ['swap', 'future', 'option']}
+}
+
+def _cache_key(*parts: str) -> str:
+    """Build a filesystem-safe cache key from the given parts"""
+    return hashlib.md5(''.join(parts).encode('utf-8')).hexdigest()
+
+def _write_json_atomic(path: str, data: Any):
+    """Write JSON to a temp file and move it into place so readers never see a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class MarketsCache:
+    """Disk-backed cache of the contract markets from ccxt load_markets() with a TTL"""
+
+    def __init__(self, cache_dir: str = CACHE_DIR, ttl: float = DEFAULT_MARKETS_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, exchange_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{_cache_key(exchange_name)}_markets.json")
+
+    def get(self, exchange_name: str) -> Optional[Dict[str, Any]]:
+        """Return cached markets for an exchange, or None if missing or expired"""
+        try:
+            with open(self._path(exchange_name), 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - cached.get('timestamp', 0) >= self.ttl:
+            return None
+        return cached.get('markets')
+
+    def set(self, exchange_name: str, markets: Dict[str, Any]):
+        """Store markets for an exchange"""
+        try:
+            _write_json_atomic(self._path(exchange_name), {'timestamp': time.time(), 'markets': markets})
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Could not cache markets for %s: %s", exchange_name, e)
+
+    async def load_markets(self, exchange) -> Dict[str, Any]:
+        """Load contract markets into an async ccxt exchange, from disk when the cache is fresh"""
+        markets = self.get(exchange.id)
+        if markets is None:
+            # Skip spot market lists where ccxt can fetch market types separately
+            exchange.options.update(CONTRACT_MARKET_OPTIONS.get(exchange.id, {}))
+            markets = await exchange.load_markets()
+            # Callers only look at derivatives, so spot and margin markets are not kept or cached
+            markets = {symbol: market for symbol, market in markets.items() if market.get('contract')}
+            self.set(exchange.id, markets)
+
+        # set_markets rebuilds markets_by_id, symbols and currencies like load_markets does
+        exchange.set_markets(markets)
+        return exchange.markets
+
+DEFAULT_RATES_TTL = float(os.environ.get('FUNDING_RATE_CACHE_TTL', 15 * 60))
+
+class FundingRateCache:
+    """Disk-backed cache of funding rate results keyed by (exchange, perpetual symbol)"""
+
+    def __init__(self, cache_dir: str = os.path.join(CACHE_DIR, 'rates'), ttl: float = DEFAULT_RATES_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, exchange_name: str, perp_symbol: str) -> str:
+        return os.path.join(self.cache_dir, f"{_cache_key(exchange_name, perp_symbol)}.json")
+
+    def get(self, exchange_name: str, perp_symbol: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result, or None if missing or older than the TTL"""
+        entry = self.get_entry(exchange_name, perp_symbol)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, exchange_name: str, perp_symbol: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return a cached result with the time it was written, or None if missing or older than the TTL"""
+        path = self._path(exchange_name, perp_symbol)
+        try:
+            mtime = os.path.getmtime(path)
+            if time.time() - mtime < self.ttl:
+                with open(path, 'r') as f:
+                    result = json.load(f)
+                self.hits += 1
+                return result, mtime
+        except (OSError, ValueError):
+            pass
+
+        self.misses += 1
+        return None
+
+    def set(self, exchange_name: str, perp_symbol: str, result: Dict[str, Any]):
+        """Store a result"""
+        try:
+            _write_json_atomic(self._path(exchange_name, perp_symbol), result)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Could not cache funding rate for %s %s: %s", exchange_name, perp_symbol, e)
+
+    def clear(self) -> int:
+        """Remove all cached results and return how many were removed"""
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        self.hits = 0
+        self.misses = 0
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this cache"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'ttl': self.ttl
+        }
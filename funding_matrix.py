@@ -0,0 +1,74 @@
+import numpy as np
+from typing import Any, List
+
+class FundingRateMatrix:
+    """Compact symbol x exchange view of funding rate results for fast offline filtering"""
+
+    def __init__(self, symbols: List[str], exchanges: List[str], has_rate: np.ndarray, rates: np.ndarray):
+        self.symbols = list(symbols)
+        self.exchanges = list(exchanges)
+        self.has_rate = has_rate
+        self.rates = rates
+        self._symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._exchange_index = {exchange: j for j, exchange in enumerate(self.exchanges)}
+        self._collected = np.zeros(len(self.symbols), dtype=bool)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._symbol_index
+
+    @classmethod
+    def empty(cls, symbols: List[str], exchanges: List[str]) -> 'FundingRateMatrix':
+        """Create a matrix with no results recorded yet"""
+        shape = (len(symbols), len(exchanges))
+        return cls(symbols, exchanges, np.zeros(shape, dtype=bool), np.full(shape, np.nan, dtype=np.float32))
+
+    def record(self, symbol: str, exchange_results: List[Any]):
+        """Record the FundingRateResults of one symbol"""
+        row = self._symbol_index[symbol]
+        for result in exchange_results:
+            j = self._exchange_index[result.exchange]
+            if result.success:
+                self.has_rate[row, j] = True
+                if result.funding_rate is not None:
+                    self.rates[row, j] = result.funding_rate
+        self._collected[row] = True
+
+    def collected(self) -> 'FundingRateMatrix':
+        """Return a matrix holding only the symbols that were recorded"""
+        mask = self._collected
+        symbols = [symbol for symbol, keep in zip(self.symbols, mask) if keep]
+        matrix = FundingRateMatrix(symbols, self.exchanges, self.has_rate[mask], self.rates[mask])
+        matrix._collected[:] = True
+        return matrix
+
+    def exchanges_for(self, symbol: str) -> List[str]:
+        """Get the exchanges that returned a funding rate for a symbol"""
+        row = self.has_rate[self._symbol_index[symbol]]
+        return [exchange for exchange, has_rate in zip(self.exchanges, row) if has_rate]
+
+    def exchange_counts(self) -> np.ndarray:
+        """Number of exchanges with a funding rate, per symbol"""
+        return self.has_rate.sum(axis=1)
+
+    def most_listed(self, n: int = 20) -> List[str]:
+        """Get the n symbols with a funding rate on the most exchanges"""
+        order = np.argsort(-self.exchange_counts(), kind='stable')[:n]
+        return [self.symbols[i] for i in order]
+
+    def save(self, filename: str):
+        """Save to a compressed .npz file"""
+        np.savez_compressed(
+            filename,
+            symbols=np.array(self.symbols),
+            exchanges=np.array(self.exchanges),
+            has_rate=self.has_rate,
+            rates=self.rates
+        )
+
+    @classmethod
+    def load(cls, filename: str) -> 'FundingRateMatrix':
+        """Load a matrix saved with save()"""
+        with np.load(filename) as data:
+            matrix = cls(data['symbols'].tolist(), data['exchanges'].tolist(), data['has_rate'], data['rates'])
+        matrix._collected[:] = True
+        return matrix
@@ -1,15 +1,29 @@
 #!/usr/bin/env python3
 
-import ccxt
-import json
+import ccxt.async_support as ccxt
+import asyncio
+import orjson
+import sys
 from typing import List, Set
 from datetime import datetime
 import logging
 
+from cache import MarketsCache
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Use the libuv-backed event loop when available; asyncio.run() picks it up through the policy
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
+# Quote/settlement currencies that are never reported as tokens
+STABLECOINS = frozenset({'USDT', 'USD', 'BUSD', 'USDC'})
+
 class TokenCollector:
     """Collect all available tokens from multiple cryptocurrency exchanges"""
     
@@ -24,43 +38,45 @@ class TokenCollector:
             'okx': ccxt.okx({'enableRateLimit': True}),
             'mexc': ccxt.mexc({'enableRateLimit': True})
         }
+        self.markets_cache = MarketsCache()
         
         # Configure exchanges
         for exchange_name, exchange in self.exchanges.items():
             exchange.set_sandbox_mode(False)
     
-    def get_tokens_from_exchange(self, exchange_name: str) -> Set[str]:
+    async def get_tokens_from_exchange(self, exchange_name: str) -> Set[str]:
         """Get all base tokens from a single exchange"""
+        exchange = self.exchanges[exchange_name]
         try:
-            exchange = self.exchanges[exchange_name]
+            logger.info("Getting tokens from %s...", exchange_name)
             
-            # Load markets
-            exchange.load_markets()
+            # Load markets, from the on-disk cache when it is fresh
+            await self.markets_cache.load_markets(exchange)
             
-            tokens = set()
+            # Base symbols (e.g., BTC from BTC/USDT:USDT); MarketsCache only keeps contract markets
+            tokens = {
+                market['base']
+                for market in exchange.markets.values()
+                if market.get('base') and market['base'] not in STABLECOINS
+            }
             
-            for symbol, market in exchange.markets.items():
-                # Check if it's a perpetual/swap contract
-                if market.get('type') == 'swap' or market.get('contract') == True:
-                    # Extract base symbol (e.g., BTC from BTC/USDT:USDT)
-                    base_symbol = market.get('base', '')
-                    if base_symbol and base_symbol not in ['USDT', 'USD', 'BUSD', 'USDC']:
-                        tokens.add(base_symbol)
-            
-            logger.info(f"Found {len(tokens)} unique tokens on {exchange_name}")
+            logger.info("Found %s unique tokens on %s", len(tokens), exchange_name)
             return tokens
             
         except Exception as e:
-            logger.error(f"Error getting tokens from {exchange_name}: {str(e)}")
+            logger.error("Error getting tokens from %s: %s", exchange_name, e)
             return set()
+        finally:
+            # Release the aiohttp session held by the async exchange
+            await exchange.close()
     
-    def get_all_merged_tokens(self) -> List[str]:
-        """Get all unique tokens merged from all exchanges"""
+    async def get_all_merged_tokens(self) -> List[str]:
+        """Get all unique tokens merged from all exchanges concurrently"""
         all_tokens = set()
         
-        for exchange_name in self.exchanges.keys():
-            logger.info(f"Getting tokens from {exchange_name}...")
-            exchange_tokens = self.get_tokens_from_exchange(exchange_name)
+        # get_tokens_from_exchange logs its own errors and returns an empty set
+        tasks = [self.get_tokens_from_exchange(exchange_name) for exchange_name in self.exchanges]
+        for exchange_tokens in await asyncio.gather(*tasks):
             all_tokens.update(exchange_tokens)
         
         # Convert to sorted list
@@ -73,10 +89,10 @@ class TokenCollector:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f'merged_tokens_{timestamp}.json'
         
-        with open(filename, 'w') as f:
-            json.dump(tokens, f, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(tokens, option=orjson.OPT_INDENT_2))
         
-        logger.info(f"Merged tokens saved to {filename}")
+        logger.info("Merged tokens saved to %s", filename)
         return filename
 
 def main():
@@ -84,18 +100,19 @@ def main():
     collector = TokenCollector()
         
     # Get all merged tokens
-    merged_tokens = collector.get_all_merged_tokens()
+    merged_tokens = asyncio.run(collector.get_all_merged_tokens())
     
     # Save to JSON
     filename = collector.save_to_json(merged_tokens)
     
-    print(f" Merged tokens exported to: {filename}")
-    
-    for i, token in enumerate(merged_tokens[:50], 1):
-        print(f"  {i:2d}. {token}")
+    # Build the listing and write it once rather than a print per token
+    lines = [f" Merged tokens exported to: {filename}"]
+    lines.extend(f"  {i:2d}. {token}" for i, token in enumerate(merged_tokens[:50], 1))
     
     if len(merged_tokens) > 50:
-        print(f"  ... and {len(merged_tokens) - 50} more tokens")
+        lines.append(f"  ... and {len(merged_tokens) - 50} more tokens")
+    
+    sys.stdout.write('\n'.join(lines) + '\n')
     
     return merged_tokens
 
@@ -1,340 +1,884 @@
 import ccxt.async_support as ccxt
 import asyncio
 import aiohttp
-import json
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import atexit
+import functools
+import glob
+import itertools
+import orjson
+import os
+import random
+import ssl
+import sys
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Any, Set, Tuple
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
 import logging
 import time
 
+from cache import FundingRateCache, MarketsCache
+from funding_matrix import FundingRateMatrix
+from rate_limit import TokenBucket
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Use the libuv-backed event loop when available; it has cheaper socket dispatch for wide fan-outs
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
+# Concurrency budget per exchange to stay under venue rate limits; the connector pool caps open connections overall
+MAX_CONCURRENT_REQUESTS_PER_EXCHANGE = 8
+
+# Public REST limits per exchange as (requests per second, burst), kept a little under each venue's documented cap
+RATE_LIMITS = {
+    'bitget': (15, 20),
+    'huobi': (8, 16),
+    'kucoin': (15, 30),
+    'bybit': (50, 100),
+    'bingx': (8, 16),
+    'gateio': (15, 30),
+    'okx': (10, 20),
+    'mexc': (15, 20)
+}
+
+# ccxt raises these on HTTP 429 and similar pushback; they are sibling NetworkError subclasses, so both are listed
+RATE_LIMIT_ERRORS = (ccxt.RateLimitExceeded, ccxt.DDoSProtection)
+
+# Transient failures (timeouts, resets, 429s) are retried with exponential backoff; BadSymbol and other exchange errors are not
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 0.25
+RETRYABLE_ERRORS = (ccxt.NetworkError, aiohttp.ClientError, asyncio.TimeoutError)
+
+# Symbols in flight at once in multi-symbol runs; a finished symbol frees its slot for the next one
+SYMBOL_BATCH_SIZE = 200
+
+# ccxt's unified symbol for USDT-margined perpetuals, accepted by every exchange
+UNIFIED_SWAP_TEMPLATE = '{b}/USDT:USDT'
+
+# Perpetual symbol templates per exchange, formatted with the base symbol
+_PERP_FMT = {
+    'bitget': '{b}/USDT:USDT',      # Bitget uses BTC/USDT:USDT for swap contracts
+    'huobi': '{b}-USDT',            # Huobi uses BTC-USDT
+    'kucoin': '{b}USDTM',           # KuCoin uses XBTUSDTM
+    'bybit': '{b}USDT',             # Bybit uses BTCUSDT
+    'bingx': '{b}-USDT',            # BingX uses BTC-USDT
+    'gateio': '{b}/USDT:USDT',      # Gate.io uses BTC/USDT:USDT for swap contracts
+    'okx': '{b}-USDT-SWAP',         # OKX uses BTC-USDT-SWAP
+    'mexc': '{b}_USDT',             # MEXC uses BTC_USDT
+    'binance': '{b}USDT'            # Binance uses BTCUSDT
+}
+
+# KuCoin futures base symbols that differ from the common ones (KuCoin lists bitcoin as XBT)
+KUCOIN_BASE_ALIASES = {'XBT': 'BTC'}
+_KUCOIN_BASES = {base_symbol: kucoin_base for kucoin_base, base_symbol in KUCOIN_BASE_ALIASES.items()}
+
+try:
+    # C parser for the ISO 8601 timestamps ccxt returns, handles the Z suffix natively
+    from ciso8601 import parse_datetime as _parse_datetime
+except ImportError:
+    def _parse_datetime(value: str) -> datetime:
+        """Parse an ISO 8601 timestamp such as 2025-07-30T16:00:00.000Z"""
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+@functools.lru_cache(maxsize=8192)
+def _perp_symbol(exchange_name: str, base_symbol: str) -> str:
+    """Format the perpetual symbol of a base symbol on an exchange"""
+    if exchange_name == 'kucoin':
+        base_symbol = _KUCOIN_BASES.get(base_symbol, base_symbol)
+    return _PERP_FMT.get(exchange_name, '{b}/USDT').format(b=base_symbol)
+
+def _not_listed_error(exchange_name: str, base_symbol: str) -> str:
+    """Error message for an exchange with no USDT perpetual for a base symbol, the same whichever check found it"""
+    return f"{base_symbol} is not listed on {exchange_name}"
+
+@functools.lru_cache(maxsize=8192)
+def _base_symbol(symbol: str) -> str:
+    """Get the base symbol of a pair like BTC/USDT"""
+    return symbol.partition('/')[0]
+
+class FundingRateResult(NamedTuple):
+    """Funding rate of one symbol on one exchange"""
+    exchange: str
+    symbol: str
+    perpetual_symbol: str
+    funding_rate: Optional[float]
+    funding_time: Optional[str]
+    next_funding_time: Optional[str]
+    timestamp: Optional[int]
+    success: bool
+    error: Optional[str]
+
+def _funding_rate_info(perp_symbol: str, funding_rate: Any, next_funding_ms: Any, timestamp: Any, funding_ms: Any = None) -> Dict[str, Any]:
+    """Build a ccxt-shaped funding rate structure from raw exchange fields"""
+    return {
+        'symbol': perp_symbol,
+        'fundingRate': float(funding_rate),
+        'fundingDatetime': ccxt.Exchange.iso8601(int(funding_ms)) if funding_ms else None,
+        'nextFundingDatetime': ccxt.Exchange.iso8601(int(next_funding_ms)) if next_funding_ms else None,
+        'timestamp': int(timestamp) if timestamp else None
+    }
+
+# Origins of the direct API calls made outside ccxt
+BYBIT_API = 'https://api.bybit.com'
+OKX_API = 'https://www.okx.com'
+KUCOIN_FUTURES_API = 'https://api-futures.kucoin.com'
+
+async def _bybit_funding_rates(session: aiohttp.ClientSession) -> Dict[str, Dict[str, Any]]:
+    """Get all Bybit USDT perpetual funding rates from the linear tickers endpoint"""
+    async with session.get(f'{BYBIT_API}/v5/market/tickers', params={'category': 'linear'}) as response:
+        data = orjson.loads(await response.read())
+    if data.get('retCode') != 0:
+        raise ccxt.ExchangeError(f"Bybit API error: {data.get('retMsg', 'Unknown error')}")
+    
+    rates = {}
+    for ticker in data['result']['list']:
+        perp_symbol = ticker['symbol']
+        # Linear tickers also include USDC perpetuals and dated futures without a funding rate
+        if perp_symbol.endswith('USDT') and ticker.get('fundingRate'):
+            rates[perp_symbol[:-len('USDT')]] = _funding_rate_info(perp_symbol, ticker['fundingRate'], ticker.get('nextFundingTime'), data.get('time'))
+    return rates
+
+async def _okx_funding_rates(session: aiohttp.ClientSession) -> Dict[str, Dict[str, Any]]:
+    """Get all OKX USDT perpetual funding rates in one call using instId=ANY"""
+    async with session.get(f'{OKX_API}/v5/public/funding-rate', params={'instId': 'ANY'}) as response:
+        data = orjson.loads(await response.read())
+    if data.get('code') != '0':
+        raise ccxt.ExchangeError(f"OKX API error: {data.get('msg', 'Unknown error')}")
+    
+    rates = {}
+    for item in data['data']:
+        perp_symbol = item['instId']
+        if perp_symbol.endswith('-USDT-SWAP') and item.get('fundingRate'):
+            rates[perp_symbol[:-len('-USDT-SWAP')]] = _funding_rate_info(perp_symbol, item['fundingRate'], item.get('nextFundingTime'), item.get('ts'), item.get('fundingTime'))
+    return rates
+
+async def _kucoin_funding_rates(session: aiohttp.ClientSession) -> Dict[str, Dict[str, Any]]:
+    """Get all KuCoin USDT perpetual funding rates from the active contracts list"""
+    async with session.get(f'{KUCOIN_FUTURES_API}/api/v1/contracts/active') as response:
+        data = orjson.loads(await response.read())
+    if data.get('code') != '200000':
+        raise ccxt.ExchangeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
+    
+    now = int(time.time() * 1000)
+    rates = {}
+    for contract in data['data']:
+        perp_symbol = contract['symbol']
+        if perp_symbol.endswith('USDTM') and contract.get('fundingFeeRate') is not None:
+            base_symbol = perp_symbol[:-len('USDTM')]
+            base_symbol = KUCOIN_BASE_ALIASES.get(base_symbol, base_symbol)
+            # nextFundingRateTime is a countdown in milliseconds, not a timestamp
+            countdown = contract.get('nextFundingRateTime')
+            next_funding = now + int(countdown) if countdown else None
+            rates[base_symbol] = _funding_rate_info(perp_symbol, contract['fundingFeeRate'], next_funding, now)
+    return rates
+
+# Keys into each ccxt exchange's urls['api'] for the APIs its market and funding rate requests go to;
+# KuCoin is only queried directly, and mexc also loads its spot markets
+CCXT_API_KEYS = {
+    'bitget': [('mix',)],
+    'huobi': [('contract',)],
+    'bybit': [('public',)],
+    'bingx': [('swap',)],
+    'gateio': [('public', 'futures')],
+    'okx': [('rest',)],
+    'mexc': [('spot', 'public'), ('contract', 'public')]
+}
+
+def _api_origin(exchange, keys: Tuple[str, ...]) -> str:
+    """Resolve the scheme://host origin of one of an exchange's REST APIs"""
+    url = exchange.urls['api']
+    for key in keys:
+        url = url[key]
+    # Huobi serves each API type from its own hostname
+    hostname = exchange.urls.get('hostnames', {}).get(keys[0], exchange.hostname)
+    parts = urlsplit(exchange.implode_params(url, {'hostname': hostname}))
+    return f"{parts.scheme}://{parts.netloc}"
+
+# Direct bulk endpoints that skip ccxt's request and parsing layers on the busiest exchanges,
+# and cover KuCoin futures, which the ccxt kucoin (spot) exchange cannot
+FAST_PATHS = {
+    'bybit': _bybit_funding_rates,
+    'okx': _okx_funding_rates,
+    'kucoin': _kucoin_funding_rates
+}
+FAST_PATH_ORIGINS = {
+    'bybit': BYBIT_API,
+    'okx': OKX_API,
+    'kucoin': KUCOIN_FUTURES_API
+}
+
+_on_json_response = ccxt.Exchange.on_json_response
+
+def _orjson_response(self, response_body):
+    """Decode ccxt HTTP responses with orjson unless the exchange needs numbers kept as strings"""
+    if self.quoteJsonNumbers:
+        return _on_json_response(self, response_body)
+    return orjson.loads(response_body)
+
+ccxt.Exchange.on_json_response = _orjson_response
+
+# Funding rates are only consumed as floats, so ccxt can hand numbers straight through from orjson.
+# ccxt's own limiter spaces every request by the worst-case delay; the collector's token buckets pace them instead
+EXCHANGE_CONFIG = {'enableRateLimit': False, 'quoteJsonNumbers': False}
+
 class FundingRateCollector:
     """Collect funding rates from multiple cryptocurrency exchanges"""
     
     def __init__(self):
         self.exchanges = {
-            'bitget': ccxt.bitget({'enableRateLimit': True}),
-            'huobi': ccxt.huobi({'enableRateLimit': True}),
-            'kucoin': ccxt.kucoin({'enableRateLimit': True}),
-            'bybit': ccxt.bybit({'enableRateLimit': True}),
-            'bingx': ccxt.bingx({'enableRateLimit': True}),
-            'gateio': ccxt.gateio({'enableRateLimit': True}),
-            'okx': ccxt.okx({'enableRateLimit': True}),
-            'mexc': ccxt.mexc({'enableRateLimit': True})
+            'bitget': ccxt.bitget(EXCHANGE_CONFIG),
+            'huobi': ccxt.huobi(EXCHANGE_CONFIG),
+            'kucoin': ccxt.kucoin(EXCHANGE_CONFIG),
+            'bybit': ccxt.bybit(EXCHANGE_CONFIG),
+            'bingx': ccxt.bingx(EXCHANGE_CONFIG),
+            'gateio': ccxt.gateio(EXCHANGE_CONFIG),
+            'okx': ccxt.okx(EXCHANGE_CONFIG),
+            'mexc': ccxt.mexc(EXCHANGE_CONFIG)
         }
+        self.markets_cache = MarketsCache()
+        self.rate_cache = FundingRateCache()
+        
+        # Shared HTTP session for all exchanges, created lazily inside the event loop
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._warmed_session: Optional[aiohttp.ClientSession] = None
+        self._warm_task: Optional[asyncio.Task] = None
+        
+        # Symbol template that last resolved on each exchange, tried first on the next symbol
+        self._winning_template: Dict[str, str] = {}
+        
+        # In-memory rate cache in front of the disk cache, with one lock per key to coalesce requests
+        self._memory_cache: Dict[Tuple[str, str], Tuple[float, FundingRateResult]] = {}
+        self._memory_hits = 0
+        self._memory_misses = 0
+        
+        # Exchanges whose markets are loaded, and their USDT-settled swap symbol per base symbol
+        self._markets_loaded: Set[str] = set()
+        self._swap_symbols: Dict[str, Dict[str, str]] = {}
+        
+        # Concurrency caps, rate limiters and cache locks; asyncio primitives bind to the loop that first
+        # waits on them, so _ensure_session builds them for each event loop the collector runs on
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._cache_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
         
         # Configure exchanges for sandbox/testnet if needed
         for exchange_name, exchange in self.exchanges.items():
             exchange.set_sandbox_mode(False)  # Set to True for testnet
     
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """Create the shared keep-alive session used by every ccxt exchange and the direct API calls, plus the loop-bound limits"""
+        loop = asyncio.get_running_loop()
+        if self._session_loop is not loop:
+            # Cap in-flight requests per exchange so wide symbol fan-outs stay within rate limits
+            self._semaphores = {name: asyncio.Semaphore(MAX_CONCURRENT_REQUESTS_PER_EXCHANGE) for name in self.exchanges}
+            self._buckets = {name: TokenBucket(*RATE_LIMITS[name]) for name in self.exchanges}
+            self._cache_locks = {}
+        
+        if self.session is None or self.session.closed or self._session_loop is not loop:
+            # Verify certificates the way ccxt's own sessions do: against its CA bundle (certifi), unless verify is off
+            reference = next(iter(self.exchanges.values()))
+            ssl_settings = (reference.verify, reference.cafile)
+            ssl_context = ssl.create_default_context(cafile=reference.cafile) if reference.verify else False
+            connector = aiohttp.TCPConnector(ssl=ssl_context, limit=64, limit_per_host=8, ttl_dns_cache=300, keepalive_timeout=60, enable_cleanup_closed=True)
+            # ccxt passes its own timeout per request; the direct API calls get the same budget instead of aiohttp's 5 minutes
+            timeout = aiohttp.ClientTimeout(total=max(exchange.timeout for exchange in self.exchanges.values()) / 1000)
+            previous_session = self.session
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._session_loop = loop
+            for exchange in self.exchanges.values():
+                if (exchange.verify, exchange.cafile) != ssl_settings:
+                    # An exchange with its own CA bundle or verification setting keeps a session ccxt builds for it
+                    if exchange.session is previous_session:
+                        exchange.session = None
+                    exchange.own_session = True
+                    continue
+                exchange.ssl_context = ssl_context
+                exchange.session = self.session
+                # The collector owns the session, so exchange.close() must not close it
+                exchange.own_session = False
+                # Let ccxt rebind its throttler if the collector moved to a new event loop
+                exchange.asyncio_loop = None
+        return self.session
+    
+    def _backoff(self, exchange_name: str):
+        """Slow down requests to an exchange that is rate limiting us"""
+        bucket = self._buckets[exchange_name]
+        bucket.backoff()
+        logger.warning("Rate limited by %s, slowing down to %.2f requests/s for %ss", exchange_name, bucket.rate, bucket.cooldown)
+    
     def get_perpetual_symbol(self, exchange_name: str, base_symbol: str) -> str:
         """Get perpetual symbol format for each exchange (hard-coded)"""
-        symbol_mapping = {
-            'bitget': f"{base_symbol}/USDT:USDT",      # Bitget uses BTC/USDT:USDT for swap contracts
-            'huobi': f"{base_symbol}-USDT",            # Huobi uses BTC-USDT
-            'kucoin': f"{base_symbol}USDTM",           # KuCoin uses BTCUSDTM
-            'bybit': f"{base_symbol}USDT",             # Bybit uses BTCUSDT
-            'bingx': f"{base_symbol}-USDT",            # BingX uses BTC-USDT
-            'gateio': f"{base_symbol}/USDT:USDT",      # Gate.io uses BTC/USDT:USDT for swap contracts
-            'okx': f"{base_symbol}-USDT-SWAP",         # OKX uses BTC-USDT-SWAP
-            'mexc': f"{base_symbol}_USDT",             # MEXC uses BTC_USDT
-            'binance': f"{base_symbol}USDT"            # Binance uses BTCUSDT
-        }
-        return symbol_mapping.get(exchange_name, f"{base_symbol}/USDT")
+        return _perp_symbol(exchange_name, base_symbol)
 
-    async def get_kucoin_funding_rate(self, symbol: str) -> Dict[str, Any]:
-        """Get funding rate from KuCoin using direct API call"""
-        try:
-            base_symbol = symbol.replace('/USDT', '').replace('/USD', '')
-            perp_symbol = f"{base_symbol}USDTM"  # KuCoin futures symbol format
-            
-            url = f"https://api-futures.kucoin.com/api/v1/funding-rate/{perp_symbol}/current"
+    async def get_kucoin_funding_rate(self, symbol: str, base_symbol: Optional[str] = None) -> FundingRateResult:
+        """Get funding rate from KuCoin using direct API call
+
+        Rate limiting (429), server errors and connection failures are raised, so
+        _send can back off and retry them; other failures are returned as results.
+        """
+        if base_symbol is None:
+            base_symbol = _base_symbol(symbol)
+        perp_symbol = _perp_symbol('kucoin', base_symbol)
+        url = f"{KUCOIN_FUTURES_API}/api/v1/funding-rate/{perp_symbol}/current"
+        
+        async with self._ensure_session().get(url) as response:
+            if response.status == 429:
+                raise ccxt.RateLimitExceeded(f"KuCoin HTTP 429: {await response.text()}")
+            if response.status >= 500:
+                raise ccxt.ExchangeNotAvailable(f"KuCoin HTTP {response.status}: {await response.text()}")
+            if response.status != 200:
+                return self._error_result('kucoin', symbol, perp_symbol, f"HTTP {response.status}: {await response.text()}")
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('code') == '200000' and data.get('data'):
-                            funding_data = data['data']
-                            funding_rate = float(funding_data.get('value', 0))
-                            
-                            return {
-                                'exchange': 'kucoin',
-                                'symbol': symbol,
-                                'perpetual_symbol': perp_symbol,
-                                'funding_rate': funding_rate,
-                                'funding_time': None, # KuCoin API doesn't provide this in current endpoint
-                                'next_funding_time': None,  # KuCoin API doesn't provide this in current endpoint
-                                'timestamp': funding_data.get('timePoint'),
-                                'success': True,
-                                'error': None
-                            }
-                        else:
-                            return {
-                                'exchange': 'kucoin',
-                                'symbol': symbol,
-                                'perpetual_symbol': perp_symbol,
-                                'funding_rate': None,
-                                'funding_time': None,
-                                'next_funding_time': None,
-                                'timestamp': None,
-                                'success': False,
-                                'error': f"KuCoin API error: {data.get('msg', 'Unknown error')}"
-                            }
-                    else:
-                        return {
-                            'exchange': 'kucoin',
-                            'symbol': symbol,
-                            'perpetual_symbol': perp_symbol,
-                            'funding_rate': None,
-                            'funding_time': None,
-                            'next_funding_time': None,
-                            'timestamp': None,
-                            'success': False,
-                            'error': f"HTTP {response.status}: {await response.text()}"
-                        }
-        except Exception as e:
-            return {
-                'exchange': 'kucoin',
-                'symbol': symbol,
-                'perpetual_symbol': f"{symbol.replace('/USDT', '').replace('/USD', '')}USDTM",
-                'funding_rate': None,
-                'funding_time': None,
-                'next_funding_time': None,
-                'timestamp': None,
-                'success': False,
-                'error': str(e)
-            }
+            data = orjson.loads(await response.read())
+            if data.get('code') == '200000' and data.get('data'):
+                funding_data = data['data']
+                funding_rate = float(funding_data.get('value', 0))
+                
+                # KuCoin API doesn't provide the funding times in the current endpoint
+                return FundingRateResult('kucoin', symbol, perp_symbol, funding_rate, None, None, funding_data.get('timePoint'), True, None)
+            return self._error_result('kucoin', symbol, perp_symbol, f"KuCoin API error: {data.get('msg', 'Unknown error')}")
 
-    async def get_funding_rate_single_exchange(self, exchange_name: str, symbol: str = 'XCN/USDT') -> Dict[str, Any]:
-        """Get funding rate from a single exchange"""
+    def _rate_result(self, exchange_name: str, symbol: str, perp_symbol: str, funding_rate_info: Dict[str, Any]) -> FundingRateResult:
+        """Build a successful result from a ccxt funding rate structure"""
+        return FundingRateResult(
+            exchange=exchange_name,
+            symbol=symbol,
+            perpetual_symbol=perp_symbol,
+            funding_rate=funding_rate_info.get('fundingRate'),
+            funding_time=funding_rate_info.get('fundingDatetime'),
+            next_funding_time=funding_rate_info.get('nextFundingDatetime'),
+            timestamp=funding_rate_info.get('timestamp'),
+            success=True,
+            error=None
+        )
+    
+    def _error_result(self, exchange_name: str, symbol: str, perp_symbol: str, error: str) -> FundingRateResult:
+        """Build a failed result"""
+        return FundingRateResult(exchange_name, symbol, perp_symbol, None, None, None, None, False, error)
+    
+    async def _fetch_funding_rate_info(self, exchange_name: str, base_symbol: str) -> Tuple[str, Dict[str, Any]]:
+        """Fetch a funding rate for the exchange's USDT swap, guessing symbol templates only if its markets aren't indexed"""
+        exchange = self.exchanges[exchange_name]
+        swap_symbols = self._swap_symbols.get(exchange_name)
+        if swap_symbols is not None:
+            unified_symbol = swap_symbols.get(base_symbol)
+            if unified_symbol is None:
+                raise ccxt.BadSymbol(_not_listed_error(exchange_name, base_symbol))
+            return unified_symbol, await exchange.fetch_funding_rate(unified_symbol)
+        
+        # Markets not loaded: try the winning template first
+        templates = [_PERP_FMT.get(exchange_name, '{b}/USDT'), UNIFIED_SWAP_TEMPLATE]
+        winner = self._winning_template.get(exchange_name)
+        if winner is not None:
+            templates.insert(0, winner)
+        
+        last_error = None
+        # dict.fromkeys drops the duplicate winner while keeping the order
+        for template in dict.fromkeys(templates):
+            perp_symbol = template.format(b=base_symbol)
+            try:
+                funding_rate_info = await exchange.fetch_funding_rate(perp_symbol)
+            except ccxt.BadSymbol as e:
+                # Raised locally while resolving the market, so trying the next format costs no request
+                last_error = e
+                continue
+            self._winning_template[exchange_name] = template
+            return perp_symbol, funding_rate_info
+        
+        raise last_error
+    
+    async def _send(self, exchange_name: str, request: Callable[[], Awaitable[Any]]) -> Any:
+        """Send a request within the exchange's concurrency and rate limits, retrying transient failures"""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                # Only this exchange's slots are held while its bucket paces the request, so other exchanges keep flowing
+                async with self._semaphores[exchange_name]:
+                    await self._buckets[exchange_name].acquire()
+                    return await request()
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, RATE_LIMIT_ERRORS):
+                    self._backoff(exchange_name)
+                if attempt == MAX_RETRIES:
+                    raise
+                # Sleep outside the semaphores so other requests keep flowing meanwhile
+                delay = RETRY_BASE_DELAY * 2 ** attempt
+                logger.warning("Retrying %s in %.2fs after %s: %s", exchange_name, delay, type(e).__name__, e)
+                await asyncio.sleep(delay)
+    
+    async def _request_funding_rate(self, exchange_name: str, symbol: str, base_symbol: str, perp_symbol: str) -> FundingRateResult:
+        """Request a funding rate from the exchange, bypassing all caches"""
         try:
+            self._ensure_session()
+            
             # Handle KuCoin with direct API call
             if exchange_name == 'kucoin':
-                return await self.get_kucoin_funding_rate(symbol)
+                return await self._send(exchange_name, lambda: self.get_kucoin_funding_rate(symbol, base_symbol))
             
-            exchange = self.exchanges[exchange_name]
+            # Get funding rate, starting with the symbol format that last worked here
+            used_symbol, funding_rate_info = await self._send(exchange_name, lambda: self._fetch_funding_rate_info(exchange_name, base_symbol))
+            return self._rate_result(exchange_name, symbol, used_symbol, funding_rate_info)
             
-            if not exchange.markets:
-                try:
-                    await exchange.load_markets()
-                except:
+        except Exception as e:
+            logger.error("Error getting funding rate from %s: %s", exchange_name, e)
+            return self._error_result(exchange_name, symbol, perp_symbol, str(e))
+    
+    def _memory_cache_ttl(self, result: FundingRateResult) -> float:
+        """Pick how long to keep a result in memory based on how far away the next funding is"""
+        ttl = 30.0
+        next_funding = result.next_funding_time
+        if next_funding:
+            try:
+                seconds_until_funding = (_parse_datetime(next_funding) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                seconds_until_funding = 0
+            if seconds_until_funding > 10 * 60:
+                ttl = min(300.0, seconds_until_funding / 4)
+        
+        # Jitter so entries written together don't all expire together
+        return ttl * random.uniform(0.9, 1.1)
+    
+    def _get_memory_cached(self, key: Tuple[str, str]) -> Optional[FundingRateResult]:
+        """Return an in-memory cached result if it has not expired"""
+        entry = self._memory_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if time.monotonic() >= expires_at:
+            del self._memory_cache[key]
+            return None
+        self._memory_hits += 1
+        return result
+    
+    def supports_funding_rates(self, exchange_name: str) -> bool:
+        """Whether funding rates can be fetched from an exchange, per ccxt's capability flags"""
+        # KuCoin futures are served by its own API rather than the ccxt kucoin (spot) exchange
+        return exchange_name == 'kucoin' or bool(self.exchanges[exchange_name].has.get('fetchFundingRate'))
+    
+    def is_listed(self, exchange_name: str, base_symbol: str) -> bool:
+        """Whether an exchange lists a swap for the base symbol; True while its markets are not loaded"""
+        swap_symbols = self._swap_symbols.get(exchange_name)
+        return swap_symbols is None or base_symbol in swap_symbols
+    
+    def _unavailable_result(self, exchange_name: str, symbol: str, base_symbol: str) -> Optional[FundingRateResult]:
+        """Answer locally when an exchange can't return the rate: unsupported exchange or unlisted symbol"""
+        if not self.supports_funding_rates(exchange_name):
+            error = f"{exchange_name} does not support fetching funding rates"
+        elif not self.is_listed(exchange_name, base_symbol):
+            error = _not_listed_error(exchange_name, base_symbol)
+        else:
+            return None
+        return self._error_result(exchange_name, symbol, self.get_perpetual_symbol(exchange_name, base_symbol), error)
+    
+    async def get_funding_rate_single_exchange(self, exchange_name: str, symbol: str = 'XCN/USDT', base_symbol: Optional[str] = None, cache: bool = True) -> FundingRateResult:
+        """Get funding rate from a single exchange, served from the memory or disk cache when fresh"""
+        # Convert to perpetual symbol for the specific exchange
+        if base_symbol is None:
+            base_symbol = _base_symbol(symbol)
+        perp_symbol = self.get_perpetual_symbol(exchange_name, base_symbol)
+        
+        unavailable = self._unavailable_result(exchange_name, symbol, base_symbol)
+        if unavailable is not None:
+            return unavailable
+        
+        self._ensure_session()
+        if not cache:
+            return await self._request_funding_rate(exchange_name, symbol, base_symbol, perp_symbol)
+        
+        key = (exchange_name, perp_symbol)
+        cached = self._get_memory_cached(key)
+        if cached is None:
+            # Concurrent callers for the same key wait for a single upstream request
+            async with self._cache_locks.setdefault(key, asyncio.Lock()):
+                cached = self._get_memory_cached(key)
+                if cached is None:
+                    self._memory_misses += 1
+                    entry = self.rate_cache.get_entry(exchange_name, perp_symbol)
+                    if entry is not None:
+                        cached = FundingRateResult(**entry[0])
+                        # The disk entry is already partway through its TTL, so don't keep it in memory past that
+                        ttl = min(self._memory_cache_ttl(cached), self.rate_cache.ttl - (time.time() - entry[1]))
+                    else:
+                        result = await self._request_funding_rate(exchange_name, symbol, base_symbol, perp_symbol)
+                        # Only successful responses are cached so failures are retried
+                        if not result.success:
+                            return result
+                        self.rate_cache.set(exchange_name, perp_symbol, result._asdict())
+                        cached = result
+                        ttl = self._memory_cache_ttl(cached)
+                    self._memory_cache[key] = (time.monotonic() + ttl, cached)
+        
+        # Cached entries are shared between symbols with the same base, so report the symbol asked for
+        return cached._replace(symbol=symbol)
+    
+    async def warm_connections(self):
+        """Open a connection to every API host the collector calls in parallel, so DNS, TCP and TLS setup overlap before real requests"""
+        session = self._ensure_session()
+        if self._warmed_session is session:
+            return
+        self._warmed_session = session
+        
+        origins = {FAST_PATH_ORIGINS[name] for name in self.exchanges if name in FAST_PATH_ORIGINS}
+        for exchange_name, exchange in self.exchanges.items():
+            if self.supports_funding_rates(exchange_name):
+                origins.update(_api_origin(exchange, keys) for keys in CCXT_API_KEYS.get(exchange_name, []))
+        
+        async def probe(origin):
+            # Any response, even an error status, leaves a warm keep-alive connection in the pool
+            try:
+                async with session.head(origin, timeout=aiohttp.ClientTimeout(total=5)):
                     pass
-            
-            # Convert to perpetual symbol for the specific exchange
-            base_symbol = symbol.replace('/USDT', '').replace('/USD', '')
-            perp_symbol = self.get_perpetual_symbol(exchange_name, base_symbol)
-            
-            # Get funding rate using the hard-coded symbol format
-            funding_rate_info = await exchange.fetch_funding_rate(perp_symbol)
-            
-            return {
-                'exchange': exchange_name,
-                'symbol': symbol,
-                'perpetual_symbol': perp_symbol,
-                'funding_rate': funding_rate_info.get('fundingRate'),
-                'funding_time': funding_rate_info.get('fundingDatetime'),
-                'next_funding_time': funding_rate_info.get('nextFundingDatetime'),
-                'timestamp': funding_rate_info.get('timestamp'),
-                'success': True,
-                'error': None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.debug("Could not warm a connection to %s: %s", origin, e)
+        
+        await asyncio.gather(*[probe(origin) for origin in origins])
+        logger.debug("Warmed connections to %s API hosts", len(origins))
+    
+    async def warm_markets(self):
+        """Load every exchange's markets once, concurrently, and index their USDT-settled swaps by base symbol"""
+        # Warm connections alongside the market loads rather than holding them up
+        if self._warmed_session is not self._ensure_session():
+            self._warm_task = asyncio.create_task(self.warm_connections())
+        
+        # KuCoin futures are queried through its own API, so its ccxt (spot) markets are never needed,
+        # and exchanges without funding rate support are never queried
+        pending = [
+            name for name in self.exchanges
+            if name != 'kucoin' and name not in self._markets_loaded and self.supports_funding_rates(name)
+        ]
+        if not pending:
+            return
+        
+        self._ensure_session()
+        markets_results = await asyncio.gather(
+            *[self.markets_cache.load_markets(self.exchanges[name]) for name in pending],
+            return_exceptions=True
+        )
+        for exchange_name, markets in zip(pending, markets_results):
+            if isinstance(markets, Exception):
+                # Left out of _markets_loaded so the next warm_markets() call retries it
+                logger.error("Error loading markets from %s: %s", exchange_name, markets)
+                continue
+            self._markets_loaded.add(exchange_name)
+            self._swap_symbols[exchange_name] = {
+                market['base']: unified_symbol for unified_symbol, market in markets.items()
+                if market.get('swap') and market.get('settle') == 'USDT' and market.get('base') and market.get('active') is not False
             }
-            
+    
+    async def _safe(self, coro, exchange_name: str, symbol: str, base_symbol: str) -> FundingRateResult:
+        """Await a single-exchange request, turning an unexpected error into a failed result"""
+        try:
+            return await coro
         except Exception as e:
-            logger.error(f"Error getting funding rate from {exchange_name}: {str(e)}")
-            base_symbol = symbol.replace('/USDT', '').replace('/USD', '')
-            perp_symbol = self.get_perpetual_symbol(exchange_name, base_symbol)
-            return {
-                'exchange': exchange_name,
-                'symbol': symbol,
-                'perpetual_symbol': perp_symbol,
-                'funding_rate': None,
-                'funding_time': None,
-                'next_funding_time': None,
-                'timestamp': None,
-                'success': False,
-                'error': str(e)
-            }
+            logger.error("Unexpected error getting funding rate from %s: %s", exchange_name, e)
+            return self._error_result(exchange_name, symbol, self.get_perpetual_symbol(exchange_name, base_symbol), str(e))
+    
+    async def get_funding_rates_all_exchanges(self, symbol: str = 'BTC/USDT', exchange_names: Optional[List[str]] = None) -> List[FundingRateResult]:
+        """Get funding rates from all configured exchanges, or only the given ones"""
+        if exchange_names is None:
+            exchange_names = list(self.exchanges)
+        
+        base_symbol = _base_symbol(symbol)
+        
+        # Fill in locally answerable results first, so only real requests are scheduled as tasks
+        results = [self._unavailable_result(exchange_name, symbol, base_symbol) for exchange_name in exchange_names]
+        pending = [i for i, result in enumerate(results) if result is None]
+        fetched = await asyncio.gather(*[
+            self._safe(self.get_funding_rate_single_exchange(exchange_names[i], symbol, base_symbol), exchange_names[i], symbol, base_symbol)
+            for i in pending
+        ])
+        for i, result in zip(pending, fetched):
+            results[i] = result
+        return results
     
-    async def get_funding_rates_all_exchanges(self, symbol: str = 'BTC/USDT') -> List[Dict[str, Any]]:
-        """Get funding rates from all configured exchanges"""
-        tasks = []
-        start = time.time()
-        print('start: ',start)
-        for exchange_name in self.exchanges.keys():
-            task = self.get_funding_rate_single_exchange(exchange_name, symbol)
-            tasks.append(task)
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        end = time.time()
-        print('time is: ', end - start)
-
-        # Handle any exceptions that occurred
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                exchange_name = list(self.exchanges.keys())[i]
-                base_symbol = symbol.replace('/USDT', '').replace('/USD', '')
+    async def get_all_funding_rates_for_exchange(self, exchange_name: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Get funding rates for all USDT perpetuals of an exchange in one request (None if unsupported)"""
+        exchange = self.exchanges[exchange_name]
+        session = self._ensure_session()
+        
+        fast_path = FAST_PATHS.get(exchange_name)
+        if fast_path is not None:
+            try:
+                rates = await self._send(exchange_name, lambda: fast_path(session))
+                logger.info("Got %s funding rates from %s in one request", len(rates), exchange_name)
+                return rates
+            except Exception as e:
+                logger.warning("Fast path failed on %s, falling back to ccxt: %s", exchange_name, e)
+        
+        if exchange_name == 'kucoin' or not exchange.has.get('fetchFundingRates'):
+            return None
+        
+        funding_rates = await self._send(exchange_name, exchange.fetch_funding_rates)
+        
+        rates = {}
+        for unified_symbol, funding_rate_info in funding_rates.items():
+            market = exchange.markets.get(unified_symbol)
+            if market and market.get('swap') and market.get('settle') == 'USDT':
+                rates[market['base']] = funding_rate_info
+        
+        logger.info("Got %s funding rates from %s in one request", len(rates), exchange_name)
+        return rates
+    
+    def _join_bulk_rates(self, symbol: str, per_symbol_results: List[FundingRateResult], bulk_rates: Dict[str, Dict[str, Dict[str, Any]]]) -> List[FundingRateResult]:
+        """Merge per-symbol results with bulk rates for one symbol, keeping the exchange order"""
+        base_symbol = _base_symbol(symbol)
+        per_symbol_results = {r.exchange: r for r in per_symbol_results}
+        symbol_results = []
+        for exchange_name in self.exchanges:
+            if exchange_name in per_symbol_results:
+                symbol_results.append(per_symbol_results[exchange_name])
+                continue
+            
+            funding_rate_info = bulk_rates[exchange_name].get(base_symbol)
+            if funding_rate_info is None:
                 perp_symbol = self.get_perpetual_symbol(exchange_name, base_symbol)
-                processed_results.append({
-                    'exchange': exchange_name,
-                    'symbol': symbol,
-                    'perpetual_symbol': perp_symbol,
-                    'funding_rate': None,
-                    'funding_time': None,
-                    'next_funding_time': None,
-                    'timestamp': None,
-                    'success': False,
-                    'error': str(result)
-                })
+                symbol_results.append(self._error_result(exchange_name, symbol, perp_symbol, _not_listed_error(exchange_name, base_symbol)))
             else:
-                processed_results.append(result)
-        
-        return processed_results
+                symbol_results.append(self._rate_result(exchange_name, symbol, funding_rate_info['symbol'], funding_rate_info))
+        return symbol_results
     
-    async def get_multiple_symbols_funding_rates(self, symbols: List[str]) -> Dict[str, List[Dict[str, Any]]]:
-        """Get funding rates for multiple symbols from all exchanges concurrently"""
-        results = {}
-
-        async def fetch_symbol(symbol):
-            logger.info(f"Fetching funding rates for {symbol}")
-            return symbol, await self.get_funding_rates_all_exchanges(symbol)
+    async def iter_multiple_symbols_funding_rates(self, symbols: List[str]) -> AsyncIterator[Tuple[str, List[FundingRateResult]]]:
+        """Yield (symbol, results) for multiple symbols as each one completes"""
+        if not symbols:
+            return
+        
+        symbols = list(dict.fromkeys(symbols))
+        
+        # Load markets once up front rather than racing them from every symbol task
+        await self.warm_markets()
 
-        # Create tasks for all symbols
-        tasks = [fetch_symbol(symbol) for symbol in symbols]
+        # One bulk request per exchange that supports it, instead of one request per symbol
+        bulk_results = await asyncio.gather(
+            *[self.get_all_funding_rates_for_exchange(exchange_name) for exchange_name in self.exchanges],
+            return_exceptions=True
+        )
+        bulk_rates = {}
+        for exchange_name, rates in zip(self.exchanges, bulk_results):
+            if isinstance(rates, Exception):
+                logger.error("Bulk funding rates failed on %s, falling back to per-symbol requests: %s", exchange_name, rates)
+            elif rates is not None:
+                bulk_rates[exchange_name] = rates
+        
+        # Remaining exchanges are queried per symbol
+        per_symbol_exchanges = [exchange_name for exchange_name in self.exchanges if exchange_name not in bulk_rates]
 
-        # Run all tasks concurrently
-        task_results = await asyncio.gather(*tasks, return_exceptions=True)
+        async def fetch_symbol(symbol):
+            logger.debug("Fetching funding rates for %s", symbol)
+            try:
+                return symbol, await self.get_funding_rates_all_exchanges(symbol, per_symbol_exchanges)
+            except Exception as e:
+                logger.error("Error fetching symbol %s: %s", symbol, e)
+                return symbol, None
 
-        # Collect results
-        for result in task_results:
-            if isinstance(result, Exception):
-                logger.error(f"Error fetching symbol: {str(result)}")
-            else:
-                symbol, data = result
-                results[symbol] = data
+        # Keep a sliding window of symbols in flight, starting the next one as soon as any finishes
+        pending_symbols = iter(symbols)
+        tasks = {asyncio.create_task(fetch_symbol(symbol)) for symbol in itertools.islice(pending_symbols, SYMBOL_BATCH_SIZE)}
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for symbol in itertools.islice(pending_symbols, len(done)):
+                    tasks.add(asyncio.create_task(fetch_symbol(symbol)))
+                for task in done:
+                    symbol, result = task.result()
+                    if result is not None:
+                        yield symbol, self._join_bulk_rates(symbol, result, bulk_rates)
+        finally:
+            # Don't leave requests running if the consumer stops early
+            for task in tasks:
+                task.cancel()
+    
+    async def get_multiple_symbols_funding_rates(self, symbols: List[str]) -> Dict[str, List[FundingRateResult]]:
+        """Get funding rates for multiple symbols from all exchanges concurrently"""
+        results = {}
+        async for symbol, symbol_results in self.iter_multiple_symbols_funding_rates(symbols):
+            results[symbol] = symbol_results
 
-        return results
+        # Return symbols in the requested order rather than completion order
+        return {symbol: results[symbol] for symbol in symbols if symbol in results}
 
-    
-    def get_successful_rates(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def get_successful_rates(self, results: List[FundingRateResult]) -> List[FundingRateResult]:
         """Filter only successful funding rate results"""
-        return [result for result in results if result['success']]
+        return [result for result in results if result.success]
     
-    def get_failed_exchanges(self, results: List[Dict[str, Any]]) -> List[str]:
+    def get_failed_exchanges(self, results: List[FundingRateResult]) -> List[str]:
         """Get list of exchanges that failed to return funding rates"""
-        return [result['exchange'] for result in results if not result['success']]
+        return [result.exchange for result in results if not result.success]
+    
+    def clear_cache(self) -> int:
+        """Clear cached funding rates and return how many disk entries were removed"""
+        self._memory_cache.clear()
+        self._memory_hits = 0
+        self._memory_misses = 0
+        return self.rate_cache.clear()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get funding rate cache hit/miss statistics for the disk cache, plus the in-memory layer in front of it"""
+        stats = self.rate_cache.stats()
+        # Only memory misses reach the disk cache, so its counters alone miss repeated lookups
+        lookups = self._memory_hits + self._memory_misses
+        stats['memory'] = {
+            'hits': self._memory_hits,
+            'misses': self._memory_misses,
+            'hit_ratio': self._memory_hits / lookups if lookups else 0.0,
+            'entries': len(self._memory_cache)
+        }
+        return stats
     
-    async def close_connections(self):
-        """Close all exchange connections"""
+    async def aclose(self):
+        """Close all exchange connections and the shared HTTP session"""
+        if self._warm_task is not None:
+            self._warm_task.cancel()
+        
         for exchange in self.exchanges.values():
             if hasattr(exchange, 'close'):
                 await exchange.close()
+        
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+            # Give the connector a moment to finish closing TLS transports
+            await asyncio.sleep(0.1)
+    
+    async def close_connections(self):
+        """Close all exchange connections"""
+        await self.aclose()
 
 # Token loading function
 def load_tokens_from_json(filename: str = 'merged_tokens_20250730_161741.json') -> List[str]:
     """Load tokens from JSON file"""
     try:
-        with open(filename, 'r') as f:
-            tokens = json.load(f)
-        logger.info(f"Loaded {len(tokens)} tokens from {filename}")
+        with open(filename, 'rb') as f:
+            tokens = orjson.loads(f.read())
+        logger.info("Loaded %s tokens from %s", len(tokens), filename)
         return tokens
     except Exception as e:
-        logger.error(f"Error loading tokens from {filename}: {str(e)}")
+        logger.error("Error loading tokens from %s: %s", filename, e)
         return []
 
+# Long-lived event loop and collector shared by the synchronous wrappers, so
+# connection pools and DNS caches stay warm between calls
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _run(coro):
+    """Run a coroutine to completion on the shared event loop"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+@functools.lru_cache(maxsize=1)
+def _default_collector() -> FundingRateCollector:
+    """Get the collector shared by the synchronous wrappers, built on first use"""
+    return FundingRateCollector()
+
+def _close():
+    """Close the shared collector's connections and the event loop at exit"""
+    if _loop is None or _loop.is_closed():
+        return
+    # Only close the default collector if something actually created it
+    if _default_collector.cache_info().currsize:
+        _loop.run_until_complete(_default_collector().aclose())
+    _loop.close()
+
+atexit.register(_close)
+
 # Synchronous wrapper functions for easier use
-def get_funding_rates_sync(symbol: str = 'BTC/USDT') -> List[Dict[str, Any]]:
+def get_funding_rates_sync(symbol: str = 'BTC/USDT', collector: Optional[FundingRateCollector] = None) -> List[FundingRateResult]:
     """Synchronous wrapper to get funding rates from all exchanges"""
-    collector = FundingRateCollector()
-    
-    async def _get_rates():
-        try:
-            results = await collector.get_funding_rates_all_exchanges(symbol)
-            await collector.close_connections()
-            return results
-        except Exception as e:
-            logger.error(f"Error in sync wrapper: {str(e)}")
-            await collector.close_connections()
-            raise
+    collector = collector or _default_collector()
     
-    return asyncio.run(_get_rates())
+    try:
+        _run(collector.warm_markets())
+        return _run(collector.get_funding_rates_all_exchanges(symbol))
+    except Exception as e:
+        logger.error("Error in sync wrapper: %s", e)
+        raise
 
-def get_multiple_symbols_sync(symbols: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+def get_multiple_symbols_sync(symbols: List[str], collector: Optional[FundingRateCollector] = None) -> Dict[str, List[FundingRateResult]]:
     """Synchronous wrapper to get funding rates for multiple symbols"""
-    collector = FundingRateCollector()
+    collector = collector or _default_collector()
     
-    async def _get_multiple_rates():
-        try:
-            results = await collector.get_multiple_symbols_funding_rates(symbols)
-            await collector.close_connections()
-            return results
-        except Exception as e:
-            logger.error(f"Error in sync wrapper: {str(e)}")
-            await collector.close_connections()
-            raise
-    
-    return asyncio.run(_get_multiple_rates())
+    try:
+        _run(collector.warm_markets())
+        return _run(collector.get_multiple_symbols_funding_rates(symbols))
+    except Exception as e:
+        logger.error("Error in sync wrapper: %s", e)
+        raise
 
-def get_funding_rates_for_all_tokens(token_file: str = 'merged_tokens_20250730_161741.json', max_tokens: int = None) -> Dict[str, List[Dict[str, Any]]]:
-    """Get funding rates for all tokens from JSON file"""
+def _load_symbols(token_file: str, max_tokens: int = None) -> List[str]:
+    """Load tokens from JSON file and convert them to symbol format"""
     tokens = load_tokens_from_json(token_file)
     
     if not tokens:
         logger.error("No tokens loaded from file")
-        return {}
+        return []
+    
+    # Drop repeated tokens, keeping the file order
+    tokens = list(dict.fromkeys(tokens))
     
     # Limit the number of tokens if specified
     if max_tokens and len(tokens) > max_tokens:
         tokens = tokens[:max_tokens]
-        logger.info(f"Limited to first {max_tokens} tokens")
+        logger.info("Limited to first %s tokens", max_tokens)
     
     # Convert tokens to symbol format
-    symbols = [f"{token}/USDT" for token in tokens]
+    return [f"{token}/USDT" for token in tokens]
+
+def get_funding_rates_for_all_tokens(token_file: str = 'merged_tokens_20250730_161741.json', max_tokens: int = None, collector: Optional[FundingRateCollector] = None) -> Dict[str, List[FundingRateResult]]:
+    """Get funding rates for all tokens from JSON file"""
+    symbols = _load_symbols(token_file, max_tokens)
+    if not symbols:
+        return {}
     
-    logger.info(f"Getting funding rates for {len(symbols)} symbols from all exchanges...")
-    return get_multiple_symbols_sync(symbols)
+    logger.info("Getting funding rates for %s symbols from all exchanges...", len(symbols))
+    return get_multiple_symbols_sync(symbols, collector)
 
 # Example usage functions
 def print_funding_rates(symbol: str = 'BTC/USDT'):
     """Print funding rates in a formatted way"""
-    print(f"\n=== Funding Rates for {symbol} ===")
-    print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("-" * 80)
-    
     results = get_funding_rates_sync(symbol)
     
-    successful_results = [r for r in results if r['success']]
-    failed_results = [r for r in results if not r['success']]
+    successful_results = [r for r in results if r.success]
+    failed_results = [r for r in results if not r.success]
+    
+    # Build the whole report and write it once rather than a print per row
+    lines = [
+        f"\n=== Funding Rates for {symbol} ===",
+        f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        "-" * 80
+    ]
     
     # Print successful results
     if successful_results:
-        print(f"{'Exchange':<12} {'Funding Rate':<15} {'Next Funding Time':<20}")
-        print("-" * 80)
+        lines.append(f"{'Exchange':<12} {'Funding Rate':<15} {'Next Funding Time':<20}")
+        lines.append("-" * 80)
         
         for result in successful_results:
-            funding_rate = result['funding_rate']
+            funding_rate = result.funding_rate
             if funding_rate is not None:
                 funding_rate_pct = f"{funding_rate * 100:.4f}%" if funding_rate else "N/A"
             else:
                 funding_rate_pct = "N/A"
             
-            next_funding = result['next_funding_time']
+            next_funding = result.next_funding_time
             if next_funding:
-                next_funding_str = datetime.fromisoformat(next_funding.replace('Z', '+00:00')).strftime('%H:%M:%S')
+                next_funding_str = _parse_datetime(next_funding).strftime('%H:%M:%S')
             else:
                 next_funding_str = "N/A"
             
-            print(f"{result['exchange']:<12} {funding_rate_pct:<15} {next_funding_str:<20}")
+            lines.append(f"{result.exchange:<12} {funding_rate_pct:<15} {next_funding_str:<20}")
     
     # Print failed exchanges
     if failed_results:
-        print(f"\nFailed to get data from: {', '.join([r['exchange'] for r in failed_results])}")
+        lines.append(f"\nFailed to get data from: {', '.join([r.exchange for r in failed_results])}")
         for result in failed_results:
-            print(f"  {result['exchange']}: {result['error']}")
+            lines.append(f"  {result.exchange}: {result.error}")
+    
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 def save_funding_rates_to_json(symbol: str = 'BTC/USDT', filename: str = None):
     """Save funding rates to JSON file"""
@@ -344,64 +888,130 @@ def save_funding_rates_to_json(symbol: str = 'BTC/USDT', filename: str = None):
     
     results = get_funding_rates_sync(symbol)
     
-    with open(filename, 'w') as f:
-        json.dump(results, f, indent=2, default=str)
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps([result._asdict() for result in results], default=str, option=orjson.OPT_INDENT_2))
     
     print(f"Funding rates saved to {filename}")
     return filename
 
-def save_all_tokens_funding_rates_to_json(token_file: str = 'merged_tokens_20250730_161741.json', filename: str = None):
-    """Save funding rates for all tokens to JSON file"""
+def _resume_jsonl(jsonl_filename: str, matrix: FundingRateMatrix) -> Set[str]:
+    """Record the symbols already saved to a JSON-lines file, dropping a partly written last line"""
+    completed = set()
+    try:
+        f = open(jsonl_filename, 'r+b')
+    except FileNotFoundError:
+        return completed
+    
+    with f:
+        good_size = 0
+        for line in f:
+            # A line only counts once its newline is written; otherwise the next append would run into it
+            if not line.endswith(b'\n'):
+                break
+            try:
+                (symbol, exchange_results), = orjson.loads(line).items()
+            except (ValueError, AttributeError):
+                break
+            completed.add(symbol)
+            if symbol in matrix:
+                matrix.record(symbol, [FundingRateResult(**result) for result in exchange_results])
+            good_size += len(line)
+        # A run killed mid-write leaves a truncated line; cut it off so appended lines stay valid
+        f.truncate(good_size)
+    return completed
+
+def _repack_jsonl(jsonl_filename: str, filename: str, symbols: List[str]):
+    """Rewrite a JSON-lines file of {symbol: results} objects as a single JSON object in symbols order, one line at a time"""
+    with open(jsonl_filename, 'rb') as src, open(filename, 'wb') as dst:
+        # Lines are appended as symbols complete, so index where each one starts and copy them out in input order
+        offsets = {}
+        offset = 0
+        for line in src:
+            (symbol, _), = orjson.loads(line).items()
+            offsets.setdefault(symbol, offset)
+            offset += len(line)
+        requested = set(symbols)
+        ordered = [symbol for symbol in symbols if symbol in offsets]
+        # Anything not asked for this time, e.g. from an earlier run with other tokens, follows in file order
+        ordered.extend(symbol for symbol in offsets if symbol not in requested)
+        
+        dst.write(b'{')
+        separator = b'\n'
+        for symbol in ordered:
+            src.seek(offsets[symbol])
+            # Each line is {"SYMBOL": [...]}; strip the braces to splice it into the outer object
+            dst.write(separator + b'  ' + src.readline().strip()[1:-1])
+            separator = b',\n'
+        dst.write(b'\n}\n')
+
+def save_all_tokens_funding_rates_to_json(token_file: str = 'merged_tokens_20250730_161741.json', filename: str = None, collector: Optional[FundingRateCollector] = None):
+    """Save funding rates for all tokens to JSON file, plus a .npz matrix for fast filtering"""
     if filename is None:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"all_funding_rates_{timestamp}.json"
+        # Pick up the in-progress file an interrupted run left behind, so running the script again resumes it
+        leftovers = glob.glob('all_funding_rates_*.jsonl')
+        if leftovers:
+            filename = f"{os.path.splitext(max(leftovers, key=os.path.getmtime))[0]}.json"
+        else:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"all_funding_rates_{timestamp}.json"
     
     print(f"🚀 Getting funding rates for all tokens from {token_file}...")
-    results = get_funding_rates_for_all_tokens(token_file)
+    symbols = _load_symbols(token_file)
+    collector = collector or _default_collector()
+    
+    # Only the compact matrix is kept in memory; full results go straight to disk, one JSON line per symbol.
+    # Calling again with the same filename (or none) after an interrupted run resumes from the .jsonl file
+    matrix = FundingRateMatrix.empty(symbols, list(collector.exchanges))
+    jsonl_filename = f"{os.path.splitext(filename)[0]}.jsonl"
+    completed = _resume_jsonl(jsonl_filename, matrix)
+    pending = [symbol for symbol in symbols if symbol not in completed]
+    if completed:
+        logger.info("Resuming from %s: %s symbols already collected, %s left", jsonl_filename, len(completed), len(pending))
+    
+    async def _stream_results(f):
+        async for symbol, exchange_results in collector.iter_multiple_symbols_funding_rates(pending):
+            f.write(orjson.dumps({symbol: [result._asdict() for result in exchange_results]}, default=str) + b'\n')
+            matrix.record(symbol, exchange_results)
     
     # Save results
-    with open(filename, 'w') as f:
-        json.dump(results, f, indent=2, default=str)
+    logger.info("Getting funding rates for %s symbols from all exchanges...", len(pending))
+    with open(jsonl_filename, 'ab') as f:
+        _run(_stream_results(f))
+    
+    _repack_jsonl(jsonl_filename, filename, symbols)
+    os.remove(jsonl_filename)
+    
+    matrix = matrix.collected()
+    matrix_filename = f"{os.path.splitext(filename)[0]}.npz"
+    matrix.save(matrix_filename)
     
     # Print summary
-    total_symbols = len(results)
-    successful_symbols = 0
-    total_successful_exchanges = 0
+    exchange_counts = matrix.exchange_counts()
+    total_symbols = len(matrix.symbols)
+    successful_symbols = int((exchange_counts > 0).sum())
+    total_successful_exchanges = int(exchange_counts.sum())
     
     print(f"\n📊 Summary:")
     print(f"Total symbols processed: {total_symbols}")
-    
-    for symbol, exchange_results in results.items():
-        successful_exchanges = len([r for r in exchange_results if r['success']])
-        total_successful_exchanges += successful_exchanges
-        if successful_exchanges > 0:
-            successful_symbols += 1
-    
     print(f"Symbols with successful funding rates: {successful_symbols}/{total_symbols}")
     print(f"Total successful exchange responses: {total_successful_exchanges}")
-    print(f"✅ All funding rates saved to {filename}")
+    print(f"✅ All funding rates saved to {filename} (matrix: {matrix_filename})")
     
-    return filename, results
+    return filename, matrix
 
 # Main execution
 if __name__ == "__main__":
-    filename, results = save_all_tokens_funding_rates_to_json('merged_tokens_20250730_161741.json')
+    filename, matrix = save_all_tokens_funding_rates_to_json('merged_tokens_20250730_161741.json')
     
-    count = 0
-    for symbol, exchange_results in results.items():
-        if count >= 20:
-            break
-        
-        successful = [r for r in exchange_results if r['success']]
-        failed = [r for r in exchange_results if not r['success']]
-        
-        successful_exchanges = [r['exchange'] for r in successful]
-        
-        print(f"{symbol:<15} {len(successful):<12} {len(failed):<8} {', '.join(successful_exchanges)}")
-        count += 1
+    exchange_counts = matrix.exchange_counts()
+    lines = []
+    for symbol, successful_count in zip(matrix.symbols[:20], exchange_counts[:20]):
+        failed_count = len(matrix.exchanges) - successful_count
+        lines.append(f"{symbol:<15} {successful_count:<12} {failed_count:<8} {', '.join(matrix.exchanges_for(symbol))}")
     
-    if len(results) > 20:
-        print(f"... and {len(results) - 20} more tokens")
+    if len(matrix.symbols) > 20:
+        lines.append(f"... and {len(matrix.symbols) - 20} more tokens")
     
-    print(f"Complete results saved to: {filename}")
-    print("Funding rate collection completed!")
\ No newline at end of file
+    lines.append(f"Complete results saved to: {filename}")
+    lines.append("Funding rate collection completed!")
+    sys.stdout.write('\n'.join(lines) + '\n')
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """Async token bucket that lets requests burst up to a depth, then paces them at a steady rate
+
+    On a rate-limit response the rate is halved and held for a cooldown, then
+    recovers additively back to the configured rate (AIMD).
+    """
+
+    def __init__(self, rate: float, burst: float, cooldown: float = 30.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.cooldown = cooldown
+        self.tokens = burst
+        self._updated = time.monotonic()
+        self._hold_until = 0.0
+        # Waiters take turns so tokens are handed out in arrival order
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if self.rate < self.max_rate and now > self._hold_until:
+            # Recover a tenth of the configured rate per second once the cooldown is over
+            recovering = now - max(self._hold_until, self._updated)
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1 * recovering)
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def backoff(self):
+        """Halve the rate after the venue pushed back, and hold it for the cooldown"""
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+        self._hold_until = now + self.cooldown